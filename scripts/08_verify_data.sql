@@ -26,6 +26,10 @@ UNION ALL
 SELECT 'drug_exposure', COUNT(*), 'Medications' FROM drug_exposure
 UNION ALL
 SELECT 'procedure_occurrence', COUNT(*), 'Procedures' FROM procedure_occurrence
+UNION ALL
+SELECT 'drug_era', COUNT(*), 'Drug eras (ingredient level)' FROM drug_era
+UNION ALL
+SELECT 'condition_era', COUNT(*), 'Condition eras' FROM condition_era
 ORDER BY table_name;
 
 \echo ''
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+=====================================================
+INDICATE SPE: Concept Index for Athena CONCEPT.csv
+=====================================================
+Purpose: Resolve concepts without a loaded vocab schema
+Input: Athena CONCEPT.csv (tab-delimited, ~5M rows)
+Output: Memory-mapped binary index (build once, ~1 min)
+Usage: python3 concept_index.py build ../vocabularies/CONCEPT.csv
+=====================================================
+
+File layout (little-endian):
+  header    magic, version, counts and section offsets
+  domains   newline-separated domain_id strings
+  records   one per concept, sorted by (vocabulary_id, concept_code),
+            valid concepts before invalid ones with the same code
+  tokens    one per distinct lower-case word in standard, valid
+            concept names, sorted, each pointing at a postings run
+  postings  record numbers (uint32) for each token, ascending
+  pool      UTF-8 bytes for keys, concept names and tokens
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+MAGIC = b'OMOPCIX1'
+VERSION = 1
+
+# magic, version, n_records, n_tokens, n_postings,
+# domains_off, records_off, tokens_off, postings_off, pool_off
+HEADER = struct.Struct('<8sIIII5Q')
+
+# key_off, key_len, concept_id, name_off, name_len, domain_index, flags
+RECORD = struct.Struct('<IHiIHBB')
+
+# token_off, token_len, postings_start, postings_count
+TOKEN = struct.Struct('<IHII')
+
+FLAG_STANDARD = 0x01        # standard_concept = 'S'
+FLAG_CLASSIFICATION = 0x02  # standard_concept = 'C'
+FLAG_INVALID = 0x04         # invalid_reason IS NOT NULL
+
+# Bytes hashed from each end of the file by ConceptIndex.fingerprint()
+FINGERPRINT_BYTES = 1 << 20
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+Concept = namedtuple('Concept', [
+    'concept_id', 'concept_name', 'domain_id', 'standard_concept', 'invalid'
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a concept name or search term into lower-case words."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def concept_key(vocabulary_id: str, concept_code: str) -> bytes:
+    """Sort key of a concept: vocabulary_id and concept_code, NUL separated."""
+    return vocabulary_id.encode('utf-8') + b'\x00' + concept_code.encode('utf-8')
+
+
+class ConceptIndex:
+    """Read-only, memory-mapped view of a concept index file.
+
+    Opening the index only maps the file; pages are loaded lazily by
+    the operating system as lookups touch them.
+    """
+
+    def __init__(self, path: str):
+        """Map the index file and read its header."""
+        if sys.byteorder != 'little':
+            raise RuntimeError("Concept index requires a little-endian platform")
+
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.n_records, self.n_tokens, n_postings,
+         domains_off, self._records_off, self._tokens_off, postings_off,
+         self._pool_off) = HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} concept index")
+
+        self.domains = self._mm[domains_off:self._records_off].decode('utf-8').split('\n')
+        self._postings = memoryview(self._mm)[postings_off:postings_off + 4 * n_postings].cast('I')
+
+    def fingerprint(self) -> str:
+        """Cheap content hash: file size plus its first and last megabyte.
+
+        Unlike the file's mtime, this stays the same when an identical
+        index is copied or rebuilt elsewhere.
+        """
+        digest = hashlib.sha256(str(len(self._mm)).encode('ascii'))
+        digest.update(self._mm[:FINGERPRINT_BYTES])
+        digest.update(self._mm[-FINGERPRINT_BYTES:])
+        return digest.hexdigest()[:16]
+
+    def _pool(self, offset: int, length: int) -> bytes:
+        start = self._pool_off + offset
+        return self._mm[start:start + length]
+
+    def _record(self, position: int) -> tuple:
+        return RECORD.unpack_from(self._mm, self._records_off + position * RECORD.size)
+
+    def _token(self, position: int) -> tuple:
+        return TOKEN.unpack_from(self._mm, self._tokens_off + position * TOKEN.size)
+
+    def _to_concept(self, record: tuple) -> Concept:
+        _, _, concept_id, name_off, name_len, domain_index, flags = record
+        if flags & FLAG_STANDARD:
+            standard_concept = 'S'
+        elif flags & FLAG_CLASSIFICATION:
+            standard_concept = 'C'
+        else:
+            standard_concept = None
+        return Concept(
+            concept_id,
+            self._pool(name_off, name_len).decode('utf-8'),
+            self.domains[domain_index],
+            standard_concept,
+            bool(flags & FLAG_INVALID)
+        )
+
+    def _search_records(self, key: bytes) -> int:
+        """Position of the first record whose key is >= key."""
+        lo, hi = 0, self.n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_off, key_len = self._record(mid)[:2]
+            if self._pool(key_off, key_len) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _search_tokens(self, token: bytes) -> int:
+        """Position of the first token >= token."""
+        lo, hi = 0, self.n_tokens
+        while lo < hi:
+            mid = (lo + hi) // 2
+            token_off, token_len = self._token(mid)[:2]
+            if self._pool(token_off, token_len) < token:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _postings_for(self, word: str, prefix: bool = False):
+        """Sorted record positions for a word.
+
+        With prefix, names with any word starting with `word` match too
+        (the exact token sorts first, followed by its extensions).
+        """
+        token = word.encode('utf-8')
+        position = self._search_tokens(token)
+
+        runs = []
+        while position < self.n_tokens:
+            token_off, token_len, start, count = self._token(position)
+            candidate = self._pool(token_off, token_len)
+            if candidate != token and not (prefix and candidate.startswith(token)):
+                break
+            runs.append(self._postings[start:start + count])
+            if not prefix:
+                break
+            position += 1
+
+        if len(runs) == 1:
+            return runs[0]
+        return list(heapq.merge(*runs))
+
+    def get_concept(self, concept_code: str, vocabulary_id: str) -> Optional[Concept]:
+        """Concept for a (vocabulary_id, concept_code) pair, preferring valid ones."""
+        key = concept_key(vocabulary_id, concept_code)
+        position = self._search_records(key)
+        if position == self.n_records:
+            return None
+
+        record = self._record(position)
+        if self._pool(record[0], record[1]) != key:
+            return None
+        return self._to_concept(record)
+
+    def get_concept_id(self, concept_code: str, vocabulary_id: str) -> Optional[int]:
+        """Valid concept_id for a (vocabulary_id, concept_code) pair."""
+        concept = self.get_concept(concept_code, vocabulary_id)
+        if concept is None or concept.invalid:
+            return None
+        return concept.concept_id
+
+    def find_concept(self, search_term: str, domain_id: str = None) -> Optional[Concept]:
+        """First standard, valid concept whose name contains search_term.
+
+        Candidates come from the token index: the last word of the term
+        must start a word of the name (LIKE allows "cell" to match "cells"),
+        every other word must be a whole word of the name. Each candidate
+        is then checked for the full, case-insensitive substring as the SQL
+        LIKE lookup does.
+        """
+        words = tokenize(search_term)
+        if not words:
+            return None
+
+        postings = sorted(
+            (self._postings_for(word, prefix=(i == len(words) - 1)) for i, word in enumerate(words)),
+            key=len
+        )
+        needle = search_term.lower()
+
+        for position in postings[0]:
+            if not all(_contains(other, position) for other in postings[1:]):
+                continue
+
+            record = self._record(position)
+            if domain_id and self.domains[record[5]] != domain_id:
+                continue
+            if needle not in self._pool(record[3], record[4]).decode('utf-8').lower():
+                continue
+            return self._to_concept(record)
+
+        return None
+
+    def search_concept(self, search_term: str, domain_id: str = None) -> Optional[int]:
+        """concept_id of the first standard, valid concept matching search_term."""
+        concept = self.find_concept(search_term, domain_id)
+        return concept.concept_id if concept else None
+
+    def close(self):
+        """Unmap the index file."""
+        if getattr(self, '_postings', None) is not None:
+            self._postings.release()
+            self._postings = None
+        self._mm.close()
+        self._file.close()
+
+
+def _contains(sorted_positions, position: int) -> bool:
+    i = bisect.bisect_left(sorted_positions, position)
+    return i < len(sorted_positions) and sorted_positions[i] == position
+
+
+def build_index(csv_path: str, index_path: str) -> int:
+    """Convert an Athena CONCEPT.csv into a concept index file.
+
+    Returns the number of concepts written.
+    """
+    if sys.byteorder != 'little':
+        raise RuntimeError("Concept index requires a little-endian platform")
+
+    pool = bytearray()
+    domains: Dict[str, int] = {}
+    entries = []
+
+    def add_to_pool(data: bytes) -> int:
+        offset = len(pool)
+        pool.extend(data)
+        return offset
+
+    print(f"Reading {csv_path}...")
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        columns = {name.lower(): i for i, name in enumerate(next(reader))}
+        c_id = columns['concept_id']
+        c_name = columns['concept_name']
+        c_domain = columns['domain_id']
+        c_vocabulary = columns['vocabulary_id']
+        c_standard = columns['standard_concept']
+        c_code = columns['concept_code']
+        c_invalid = columns['invalid_reason']
+
+        for row in reader:
+            key = concept_key(row[c_vocabulary], row[c_code])
+            name = row[c_name].encode('utf-8')
+            domain_index = domains.setdefault(row[c_domain], len(domains))
+
+            flags = 0
+            if row[c_standard] == 'S':
+                flags |= FLAG_STANDARD
+            elif row[c_standard] == 'C':
+                flags |= FLAG_CLASSIFICATION
+            if row[c_invalid]:
+                flags |= FLAG_INVALID
+
+            entries.append((
+                key, flags & FLAG_INVALID, int(row[c_id]),
+                add_to_pool(key), add_to_pool(name), len(name), domain_index, flags
+            ))
+
+    if len(domains) > 255:
+        raise ValueError(f"Too many domains for the index format: {len(domains)}")
+
+    print(f"Sorting {len(entries):,} concepts...")
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+
+    records = bytearray(RECORD.size * len(entries))
+    postings_by_token: Dict[bytes, array] = {}
+    for position, (key, _, concept_id, key_off, name_off, name_len, domain_index, flags) in enumerate(entries):
+        RECORD.pack_into(records, position * RECORD.size,
+                         key_off, len(key), concept_id, name_off, name_len, domain_index, flags)
+
+        # Only standard, valid concepts are searchable by name
+        if flags & (FLAG_STANDARD | FLAG_INVALID) == FLAG_STANDARD:
+            name = pool[name_off:name_off + name_len].decode('utf-8')
+            for word in set(tokenize(name)):
+                postings_by_token.setdefault(word.encode('utf-8'), array('I')).append(position)
+    del entries
+
+    print(f"Writing {len(postings_by_token):,} name tokens...")
+    tokens = bytearray(TOKEN.size * len(postings_by_token))
+    postings = array('I')
+    for position, token in enumerate(sorted(postings_by_token)):
+        token_postings = postings_by_token.pop(token)
+        TOKEN.pack_into(tokens, position * TOKEN.size,
+                        add_to_pool(token), len(token), len(postings), len(token_postings))
+        postings.extend(token_postings)
+
+    if len(pool) > 0xFFFFFFFF:
+        raise ValueError("String pool exceeds the 4 GB index format limit")
+
+    domain_blob = '\n'.join(sorted(domains, key=domains.get)).encode('utf-8')
+    domains_off = HEADER.size
+    records_off = domains_off + len(domain_blob)
+    tokens_off = records_off + len(records)
+    postings_off = tokens_off + len(tokens)
+    pool_off = postings_off + 4 * len(postings)
+
+    # Write to a temporary file so readers never see a partial index
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, len(records) // RECORD.size, len(tokens) // TOKEN.size, len(postings),
+            domains_off, records_off, tokens_off, postings_off, pool_off
+        ))
+        f.write(domain_blob)
+        f.write(records)
+        f.write(tokens)
+        postings.tofile(f)
+        f.write(pool)
+    os.replace(tmp_path, index_path)
+
+    n_records = len(records) // RECORD.size
+    print(f"   ✓ Wrote {n_records:,} concepts to {index_path} ({os.path.getsize(index_path) / 1e6:,.0f} MB)")
+    return n_records
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Build or query a concept index over Athena CONCEPT.csv")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="convert CONCEPT.csv into an index file")
+    build.add_argument('csv_path', help="path to Athena CONCEPT.csv")
+    build.add_argument('-o', '--output', help="index file (default: CONCEPT.idx next to the CSV)")
+
+    lookup = commands.add_parser('lookup', help="resolve a vocabulary code")
+    lookup.add_argument('index_path')
+    lookup.add_argument('vocabulary_id')
+    lookup.add_argument('concept_code')
+
+    search = commands.add_parser('search', help="find a standard concept by name")
+    search.add_argument('index_path')
+    search.add_argument('search_term')
+    search.add_argument('--domain', help="restrict to a domain_id, e.g. Measurement")
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        output = args.output or os.path.join(os.path.dirname(args.csv_path), 'CONCEPT.idx')
+        build_index(args.csv_path, output)
+        return
+
+    index = ConceptIndex(args.index_path)
+    try:
+        if args.command == 'lookup':
+            concept = index.get_concept(args.concept_code, args.vocabulary_id)
+        else:
+            concept = index.find_concept(args.search_term, args.domain)
+    finally:
+        index.close()
+
+    if concept is None:
+        print("Concept not found")
+        sys.exit(1)
+    print(f"{concept.concept_id}\t{concept.concept_name}\t{concept.domain_id}\t{concept.standard_concept or ''}")
+
+
+if __name__ == "__main__":
+    main()
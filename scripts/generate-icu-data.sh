@@ -52,10 +52,11 @@ echo ""
 
 # Execute Python script
 echo "4. Generating ICU dummy data..."
-echo "   This will take 5-10 minutes depending on system performance..."
+echo "   This will take 5-10 minutes depending on system performance"
+echo "   (seconds when a matching snapshot exists in ../snapshots/)..."
 echo ""
 
-python3 "$PYTHON_SCRIPT"
+python3 "$PYTHON_SCRIPT" "$@"
 
 echo ""
 echo "====================================================="
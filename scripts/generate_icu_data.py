@@ -4,18 +4,30 @@
 INDICATE SPE: Generate Dummy ICU Data
 =====================================================
 Purpose: Generate realistic synthetic ICU patient data
-Population: 100 patients with mixed severity
+Population: 100 patients with mixed severity (--patients, --profile)
 Domains: Ventilation, Laboratory, Vital Signs, Medications
 OMOP CDM: v5.4 compliant with valid concept_ids
 =====================================================
 """
 
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import Json, execute_values
+import argparse
 import random
 import datetime
+import gzip
+import hashlib
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 import sys
 
+from concept_index import ConceptIndex
+
 # Database connection parameters
 DB_CONFIG = {
     'host': 'localhost',
@@ -26,41 +38,259 @@ DB_CONFIG = {
 }
 
 # Random seed for reproducibility
-random.seed(42)
+DEFAULT_SEED = 42
+
+# Bump whenever the same configuration and seed would generate different
+# data, so that stale dataset snapshots are no longer matched
+GENERATOR_VERSION = 2
+
+# Compressed binary COPY snapshots of generated datasets, keyed by config
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'snapshots')
+
+# Rows buffered before a batch (and its checkpoint) is committed
+BATCH_SIZE = 10000
+
+# Workload profile settings:
+#   max_visits              - admissions per person (1 = no readmissions)
+#   readmission_rate        - chance of each further admission after discharge
+#   ward_transfer_rate      - chance a stay of 2+ days ends on a ward (visit_detail rows)
+#   length_of_stay          - 'exponential' (mean ~5 days) or 'pareto' (heavy tail)
+#   max_los_days            - length of stay cap
+#   high_frequency_fraction - share of visits with high-frequency vital signs
+#   high_frequency_per_hour - vital sign readings per hour for those visits
+#   concept_skew            - Zipf exponent: the k-th measurement concept of each
+#                             panel is recorded with probability 1 / k**skew
+DEFAULT_PROFILE = {
+    'max_visits': 1,
+    'readmission_rate': 0.0,
+    'ward_transfer_rate': 0.0,
+    'length_of_stay': 'exponential',
+    'max_los_days': 21,
+    'high_frequency_fraction': 0.0,
+    'high_frequency_per_hour': 1,
+    'concept_skew': 0.0,
+}
+
+WORKLOAD_PROFILES = {
+    'default': DEFAULT_PROFILE,
+    'readmissions': dict(DEFAULT_PROFILE, max_visits=8, readmission_rate=0.35, ward_transfer_rate=0.6),
+    'long-stay': dict(DEFAULT_PROFILE, length_of_stay='pareto', max_los_days=180),
+    'high-frequency': dict(DEFAULT_PROFILE, high_frequency_fraction=0.1, high_frequency_per_hour=12),
+    'skewed': dict(DEFAULT_PROFILE, concept_skew=1.0),
+    'stress': dict(DEFAULT_PROFILE, max_visits=8, readmission_rate=0.35, ward_transfer_rate=0.6,
+                   length_of_stay='pareto', max_los_days=180, high_frequency_fraction=0.1,
+                   high_frequency_per_hour=12, concept_skew=1.0),
+}
+
+# Shape and scale of the 'pareto' length of stay. Capped at 180 days this
+# gives a median of 5 days (default profile: 4), a mean of ~12 days
+# (default: ~5.4) and a 99th percentile of ~160 days.
+LOS_PARETO_ALPHA = 1.1
+LOS_PARETO_SCALE = 2.5
+
+# Persistence window (days) bridging exposures into one era, as in the
+# standard OHDSI drug_era / condition_era scripts
+ERA_PERSISTENCE_WINDOW = 30
+
+# Insert column order of each generated CDM table
+CDM_COLUMNS = {
+    'person': [
+        'person_id', 'gender_concept_id', 'year_of_birth', 'month_of_birth', 'day_of_birth',
+        'birth_datetime', 'race_concept_id', 'ethnicity_concept_id', 'location_id', 'provider_id',
+        'care_site_id', 'person_source_value', 'gender_source_value', 'gender_source_concept_id',
+        'race_source_value', 'race_source_concept_id', 'ethnicity_source_value',
+        'ethnicity_source_concept_id',
+    ],
+    'observation_period': [
+        'observation_period_id', 'person_id', 'observation_period_start_date',
+        'observation_period_end_date', 'period_type_concept_id',
+    ],
+    'visit_occurrence': [
+        'visit_occurrence_id', 'person_id', 'visit_concept_id', 'visit_start_date',
+        'visit_start_datetime', 'visit_end_date', 'visit_end_datetime', 'visit_type_concept_id',
+        'provider_id', 'care_site_id', 'visit_source_value', 'visit_source_concept_id',
+        'admitted_from_concept_id', 'admitted_from_source_value', 'discharged_to_concept_id',
+        'discharged_to_source_value',
+    ],
+    'visit_detail': [
+        'visit_detail_id', 'person_id', 'visit_detail_concept_id', 'visit_detail_start_date',
+        'visit_detail_start_datetime', 'visit_detail_end_date', 'visit_detail_end_datetime',
+        'visit_detail_type_concept_id', 'provider_id', 'care_site_id', 'visit_detail_source_value',
+        'visit_detail_source_concept_id', 'admitted_from_concept_id', 'admitted_from_source_value',
+        'discharged_to_source_value', 'discharged_to_concept_id', 'preceding_visit_detail_id',
+        'parent_visit_detail_id', 'visit_occurrence_id',
+    ],
+    'condition_occurrence': [
+        'condition_occurrence_id', 'person_id', 'condition_concept_id', 'condition_start_date',
+        'condition_start_datetime', 'condition_end_date', 'condition_end_datetime',
+        'condition_type_concept_id', 'condition_status_concept_id', 'stop_reason',
+        'provider_id', 'visit_occurrence_id', 'visit_detail_id', 'condition_source_value',
+        'condition_source_concept_id', 'condition_status_source_value',
+    ],
+    'measurement': [
+        'measurement_id', 'person_id', 'measurement_concept_id', 'measurement_date',
+        'measurement_datetime', 'measurement_time', 'measurement_type_concept_id',
+        'operator_concept_id', 'value_as_number', 'value_as_concept_id', 'unit_concept_id',
+        'range_low', 'range_high', 'provider_id', 'visit_occurrence_id', 'visit_detail_id',
+        'measurement_source_value', 'measurement_source_concept_id', 'unit_source_value',
+        'value_source_value',
+    ],
+    'drug_exposure': [
+        'drug_exposure_id', 'person_id', 'drug_concept_id', 'drug_exposure_start_date',
+        'drug_exposure_start_datetime', 'drug_exposure_end_date', 'drug_exposure_end_datetime',
+        'verbatim_end_date', 'drug_type_concept_id', 'stop_reason', 'refills', 'quantity',
+        'days_supply', 'sig', 'route_concept_id', 'lot_number', 'provider_id',
+        'visit_occurrence_id', 'visit_detail_id', 'drug_source_value', 'drug_source_concept_id',
+        'route_source_value', 'dose_unit_source_value',
+    ],
+    'procedure_occurrence': [
+        'procedure_occurrence_id', 'person_id', 'procedure_concept_id', 'procedure_date',
+        'procedure_datetime', 'procedure_type_concept_id', 'modifier_concept_id', 'quantity',
+        'provider_id', 'visit_occurrence_id', 'visit_detail_id', 'procedure_source_value',
+        'procedure_source_concept_id', 'modifier_source_value',
+    ],
+    'drug_era': [
+        'drug_era_id', 'person_id', 'drug_concept_id', 'drug_era_start_date',
+        'drug_era_end_date', 'drug_exposure_count', 'gap_days',
+    ],
+    'condition_era': [
+        'condition_era_id', 'person_id', 'condition_concept_id', 'condition_era_start_date',
+        'condition_era_end_date', 'condition_occurrence_count',
+    ],
+}
+
+# Tables checked by the verification report (table, description)
+VERIFY_TABLES = [
+    ('person', 'patient demographics'),
+    ('observation_period', 'observation periods'),
+    ('visit_occurrence', 'ICU admissions'),
+    ('visit_detail', 'ICU / ward segments'),
+    ('condition_occurrence', 'diagnoses'),
+    ('measurement', 'vital signs + labs + ventilation'),
+    ('drug_exposure', 'medications'),
+    ('procedure_occurrence', 'procedures'),
+    ('drug_era', 'ingredient-level drug eras'),
+    ('condition_era', 'condition eras'),
+]
+
+# Verification modes:
+#   exact    - COUNT(*) over every table (slow on very large tables)
+#   estimate - planner statistics from pg_class / pg_stats (instant)
+#   sample   - TABLESAMPLE SYSTEM block sample scaled up, with a 95% bound
+VERIFY_MODES = ('exact', 'estimate', 'sample')
+
+# Below this many expected sampled pages, sample mode falls back to COUNT(*)
+MIN_SAMPLED_PAGES = 100
+
+# ANALYZE reads up to this many pages per unit of default_statistics_target
+# and extrapolates reltuples from them on larger tables
+ANALYZE_PAGES_PER_TARGET = 300
+
+
+def _get_rng_state() -> List:
+    """JSON-serialisable snapshot of the global RNG state."""
+    version, internal_state, gauss_next = random.getstate()
+    return [version, list(internal_state), gauss_next]
+
+
+def _set_rng_state(state: List):
+    """Restore the global RNG from _get_rng_state() output."""
+    version, internal_state, gauss_next = state
+    random.setstate((version, tuple(internal_state), gauss_next))
+
+
+def _concept_keep_probabilities(n_concepts: int, skew: float) -> List[float]:
+    """Zipf-like probability of recording each concept of a panel."""
+    return [1 / rank ** skew for rank in range(1, n_concepts + 1)]
+
+
+def _is_last_visit_of_person(visits: List, position: int) -> bool:
+    """Visits are generated person by person; True at each person boundary."""
+    return position + 1 == len(visits) or visits[position + 1][1] != visits[position][1]
+
+
+def derive_eras(intervals: List[Tuple[int, datetime.date, datetime.date]],
+                persistence_window: int = ERA_PERSISTENCE_WINDOW) -> List[Tuple]:
+    """Collapse one person's (concept_id, start_date, end_date) intervals into eras.
+
+    Intervals of the same concept whose start falls within the persistence
+    window after the running era end are merged. Returns
+    (concept_id, era_start, era_end, interval_count, gap_days) tuples, where
+    gap_days is the number of era days not covered by any interval.
+    """
+    eras = []
+    era = None
+    for concept_id, start, end in sorted(intervals):
+        if (era is not None and era[0] == concept_id
+                and start <= era[2] + datetime.timedelta(days=persistence_window)):
+            # Only count days not already covered by an earlier interval
+            covered = max(0, (end - max(start, era[2])).days)
+            era = [concept_id, era[1], max(era[2], end), era[3] + 1, era[4] + covered]
+            continue
+
+        if era is not None:
+            eras.append(era)
+        era = [concept_id, start, end, 1, (end - start).days]
+
+    if era is not None:
+        eras.append(era)
+
+    return [
+        (concept_id, start, end, count, (end - start).days - covered)
+        for concept_id, start, end, count, covered in eras
+    ]
+
 
 class ICUDataGenerator:
-    def __init__(self, db_config: Dict):
-        """Initialize generator with database connection."""
+    def __init__(self, db_config: Dict, concept_index: ConceptIndex = None, profile: Dict = None):
+        """Initialize generator with database connection.
+
+        When a concept index is given, concepts are resolved from it
+        instead of the vocab schema. The workload profile (see
+        WORKLOAD_PROFILES) defaults to one short ICU stay per person.
+        """
+        self.db_config = db_config
         self.conn = psycopg2.connect(**db_config)
         self.cursor = self.conn.cursor()
+        self.concept_index = concept_index
+        self.profile = profile or DEFAULT_PROFILE
         self.concept_cache = {}
+        self.row_counts = {}  # rows written per CDM table, checked by verify_data()
+        self.checkpoints = {}  # stage -> (status, state) loaded by start_run()
         
     def get_concept_id(self, concept_code: str, vocabulary_id: str) -> int:
         """Retrieve concept_id from vocabulary."""
         cache_key = f"{vocabulary_id}:{concept_code}"
         if cache_key in self.concept_cache:
             return self.concept_cache[cache_key]
-            
-        query = """
-            SELECT concept_id 
-            FROM vocab.concept 
-            WHERE concept_code = %s 
-            AND vocabulary_id = %s 
-            AND invalid_reason IS NULL
-            LIMIT 1
-        """
-        self.cursor.execute(query, (concept_code, vocabulary_id))
-        result = self.cursor.fetchone()
+
+        if self.concept_index is not None:
+            concept_id = self.concept_index.get_concept_id(concept_code, vocabulary_id)
+        else:
+            query = """
+                SELECT concept_id 
+                FROM vocab.concept 
+                WHERE concept_code = %s 
+                AND vocabulary_id = %s 
+                AND invalid_reason IS NULL
+                LIMIT 1
+            """
+            self.cursor.execute(query, (concept_code, vocabulary_id))
+            result = self.cursor.fetchone()
+            concept_id = result[0] if result else None
         
-        if result:
-            self.concept_cache[cache_key] = result[0]
-            return result[0]
+        if concept_id is not None:
+            self.concept_cache[cache_key] = concept_id
+            return concept_id
         else:
             print(f"WARNING: Concept not found: {concept_code} ({vocabulary_id})")
             return 0
     
     def search_concept(self, search_term: str, domain_id: str = None) -> int:
         """Search for concept by name."""
+        if self.concept_index is not None:
+            return self.concept_index.search_concept(search_term, domain_id) or 0
+
         query = """
             SELECT concept_id 
             FROM vocab.concept 
@@ -84,12 +314,15 @@ class ICUDataGenerator:
         print("\n🗑️  Clearing existing data...")
 
         tables = [
+            'cdm.drug_era',
+            'cdm.condition_era',
             'cdm.drug_exposure',
             'cdm.procedure_occurrence',
             'cdm.measurement',
             'cdm.observation',
             'cdm.condition_occurrence',
             'cdm.observation_period',
+            'cdm.visit_detail',
             'cdm.visit_occurrence',
             'cdm.person'
         ]
@@ -98,23 +331,166 @@ class ICUDataGenerator:
             self.cursor.execute(f"TRUNCATE TABLE {table} CASCADE")
             print(f"   ✓ Cleared {table}")
 
+        self.cursor.execute("DROP TABLE IF EXISTS results.generation_checkpoint")
         self.conn.commit()
         print("   ✓ All tables cleared")
 
+    def start_run(self, run_config: Dict, resume: bool = False) -> bool:
+        """Prepare checkpointing for a generation run.
+
+        With resume, progress recorded by a previous run with the same
+        configuration is loaded and True is returned; completed stages are
+        then skipped and the interrupted stage continues from its last
+        committed patient. Otherwise (or when there is nothing to resume)
+        existing data is cleared and False is returned.
+        """
+        if resume:
+            self.cursor.execute("SELECT to_regclass('results.generation_checkpoint')")
+            if self.cursor.fetchone()[0]:
+                self.cursor.execute("SELECT stage, status, state FROM results.generation_checkpoint")
+                rows = {stage: (status, state) for stage, status, state in self.cursor.fetchall()}
+                stored_config = rows.pop('run', (None, None))[1]
+                if stored_config is not None:
+                    if stored_config != run_config:
+                        raise ValueError(
+                            f"Cannot resume: checkpoint was written with {stored_config}, not {run_config}"
+                        )
+                    self.checkpoints = rows
+                    print(f"\n↻ Resuming run ({sum(s == 'complete' for s, _ in rows.values())} stage(s) complete)")
+                    return True
+            print("\nNo checkpoint to resume from, starting a new run")
+
+        self.clear_existing_data()
+        self._create_checkpoint_table([('run', 'config', run_config)])
+        self.checkpoints = {}
+        return False
+
+    def _create_checkpoint_table(self, rows: List):
+        """Create results.generation_checkpoint with (stage, status, state) rows."""
+        # Created here rather than in 04_results_tables.sql so that existing
+        # deployments pick it up without re-initialising the database
+        self.cursor.execute("""
+            CREATE TABLE results.generation_checkpoint (
+                stage VARCHAR(50) PRIMARY KEY,
+                status VARCHAR(20) NOT NULL,
+                state JSONB NOT NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """)
+        for stage, status, state in rows:
+            self.cursor.execute(
+                "INSERT INTO results.generation_checkpoint (stage, status, state) VALUES (%s, %s, %s)",
+                (stage, status, Json(state))
+            )
+        self.conn.commit()
+
+    def _start_stage(self, stage: str, next_ids: Dict[str, int]) -> Dict:
+        """Begin (or resume) a checkpointed stage.
+
+        Returns None when the stage already completed, after restoring the
+        RNG to where that stage left it. Otherwise returns the stage state:
+        position (items already committed), next_ids and row_counts. The
+        caller must call _restore_rng() once its per-stage setup is done.
+        """
+        status, state = self.checkpoints.get(stage, (None, None))
+
+        if status == 'complete':
+            _set_rng_state(state['rng_state'])
+            for table, n_rows in state['row_counts'].items():
+                self._record_rows(table, n_rows)
+            print(f"   ✓ {stage} already complete, skipping")
+            return None
+
+        if status == 'running':
+            _set_rng_state(state['stage_rng_state'])
+            for table, n_rows in state['row_counts'].items():
+                self._record_rows(table, n_rows)
+            print(f"   ↻ Resuming {stage} after {state['position']} of its items")
+            return state
+
+        state = {
+            'position': 0,
+            'next_ids': next_ids,
+            'row_counts': {},
+            'stage_rng_state': _get_rng_state(),
+            'rng_state': None,
+        }
+        self.cursor.execute(
+            "INSERT INTO results.generation_checkpoint (stage, status, state) VALUES (%s, 'running', %s)",
+            (stage, Json(state))
+        )
+        self.conn.commit()
+        return state
+
+    def load_recorded_counts(self) -> bool:
+        """Load the rows recorded by the last checkpointed run, if any.
+
+        Used with --verify-only, so the report can still compare the
+        existing data against what was generated. Returns False when there
+        is no checkpoint to load from.
+        """
+        self.cursor.execute("SELECT to_regclass('results.generation_checkpoint')")
+        if not self.cursor.fetchone()[0]:
+            return False
+
+        self.cursor.execute("SELECT state FROM results.generation_checkpoint WHERE stage <> 'run'")
+        for (state,) in self.cursor.fetchall():
+            for table, n_rows in state['row_counts'].items():
+                self._record_rows(table, n_rows)
+        return True
+
+    def _restore_rng(self, state: Dict):
+        """Continue the RNG stream from the last committed batch of a stage."""
+        if state['rng_state'] is not None:
+            _set_rng_state(state['rng_state'])
+
+    def _commit_batch(self, stage: str, state: Dict, position: int,
+                      batches: Dict[str, List], next_ids: Dict[str, int], complete: bool = False):
+        """Insert a batch and record the stage's progress in one transaction.
+
+        Batches are only committed between patients, so a resumed stage
+        restarts cleanly at item `position` with the RNG and id counters
+        exactly as an uninterrupted run would have them.
+        """
+        for table, rows in batches.items():
+            if rows:
+                self._insert_rows(table, rows)
+
+        row_counts = dict(state['row_counts'])
+        for table, rows in batches.items():
+            row_counts[table] = row_counts.get(table, 0) + len(rows)
+
+        new_state = dict(state, position=position, next_ids=dict(next_ids),
+                         row_counts=row_counts, rng_state=_get_rng_state())
+        self.cursor.execute("""
+            UPDATE results.generation_checkpoint
+            SET status = %s, state = %s, updated_at = now()
+            WHERE stage = %s
+        """, ('complete' if complete else 'running', Json(new_state), stage))
+        self.conn.commit()
+
+        for table, rows in batches.items():
+            self._record_rows(table, len(rows))
+        state.update(new_state)
+
     def generate_persons(self, n_patients: int = 100):
         """Generate PERSON table - patient demographics."""
         print(f"\n1. Generating {n_patients} patients...")
-        
+        state = self._start_stage('persons', {'person': 1})
+        if state is None:
+            return
+
         # Get gender concepts
         male_concept = self.get_concept_id('M', 'Gender')
         female_concept = self.get_concept_id('F', 'Gender')
-        
+
         # Get race/ethnicity concepts (using standard concepts)
         white_concept = 8527  # White
         unknown_race_concept = 8552  # Unknown
-        
+
+        self._restore_rng(state)
         persons = []
-        for i in range(1, n_patients + 1):
+        for i in range(state['position'] + 1, n_patients + 1):
             gender_concept = random.choice([male_concept, female_concept])
             birth_year = random.randint(1940, 2005)  # Ages 18-85 in 2025
             birth_month = random.randint(1, 12)
@@ -140,81 +516,150 @@ class ICUDataGenerator:
                 None,  # ethnicity_source_value
                 0  # ethnicity_source_concept_id
             ))
-        
-        insert_query = """
-            INSERT INTO cdm.person (
-                person_id, gender_concept_id, year_of_birth, month_of_birth, day_of_birth,
-                birth_datetime, race_concept_id, ethnicity_concept_id, location_id, provider_id,
-                care_site_id, person_source_value, gender_source_value, gender_source_concept_id,
-                race_source_value, race_source_concept_id, ethnicity_source_value, 
-                ethnicity_source_concept_id
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, persons)
-        self.conn.commit()
+
+            if len(persons) >= BATCH_SIZE:
+                self._commit_batch('persons', state, i, {'person': persons}, {'person': i + 1})
+                persons = []
+
+        self._commit_batch('persons', state, n_patients, {'person': persons},
+                           {'person': n_patients + 1}, complete=True)
         print(f"   ✓ Created {n_patients} patients")
-    
+
     def generate_icu_visits(self, n_patients: int = 100):
-        """Generate VISIT_OCCURRENCE - ICU admissions."""
+        """Generate VISIT_OCCURRENCE - ICU admissions, plus VISIT_DETAIL for ward transfers.
+
+        Depending on the workload profile, a person can be readmitted
+        several times; their visits are generated consecutively.
+        """
         print("\n2. Generating ICU visits...")
-        
+        state = self._start_stage('visits', {'visit_occurrence': 1, 'visit_detail': 1})
+
+        # Visits committed by an earlier run are read back for later stages
+        committed_visits = self._load_visits()
+        if state is None:
+            print(f"   ✓ Loaded {len(committed_visits)} ICU visits")
+            return committed_visits
+
         # ICU visit concept (Intensive Care)
         icu_concept = 9201  # Inpatient Visit
-        
+        icu_detail_concept = 32037  # Intensive Care
+        ward_detail_concept = 9201  # Inpatient Visit
+
+        profile = self.profile
+
+        self._restore_rng(state)
         visits = []
-        visit_id = 1
+        visit_details = []
+        visit_id = state['next_ids']['visit_occurrence']
+        visit_detail_id = state['next_ids']['visit_detail']
         base_date = datetime.datetime(2024, 1, 1)
-        
-        for person_id in range(1, n_patients + 1):
+
+        for person_id in range(state['position'] + 1, n_patients + 1):
             # Random admission date in 2024
             admission_days = random.randint(0, 365)
             admission_date = base_date + datetime.timedelta(days=admission_days)
-            
-            # ICU length of stay: 1-21 days (skewed toward shorter stays)
-            los_days = int(random.expovariate(1/5)) + 1  # Mean ~5 days
-            los_days = min(los_days, 21)  # Cap at 21 days
-            
-            discharge_date = admission_date + datetime.timedelta(days=los_days)
-            
-            visits.append((
-                visit_id,  # visit_occurrence_id
-                person_id,  # person_id
-                icu_concept,  # visit_concept_id
-                admission_date.date(),  # visit_start_date
-                admission_date,  # visit_start_datetime
-                discharge_date.date(),  # visit_end_date
-                discharge_date,  # visit_end_datetime
-                32817,  # visit_type_concept_id (EHR)
-                None,  # provider_id
-                None,  # care_site_id
-                f"ICU-{visit_id}",  # visit_source_value
-                0,  # visit_source_concept_id
-                0,  # admitted_from_concept_id
-                None,  # admitted_from_source_value
-                32826 if random.random() > 0.1 else 32767,  # discharged_to_concept_id (Patient discharged alive vs. Patient died)
-                None  # discharged_to_source_value
-            ))
-            visit_id += 1
-        
-        insert_query = """
-            INSERT INTO cdm.visit_occurrence (
-                visit_occurrence_id, person_id, visit_concept_id, visit_start_date,
-                visit_start_datetime, visit_end_date, visit_end_datetime, visit_type_concept_id,
-                provider_id, care_site_id, visit_source_value, visit_source_concept_id,
-                admitted_from_concept_id, admitted_from_source_value, discharged_to_concept_id,
-                discharged_to_source_value
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, visits)
-        self.conn.commit()
-        print(f"   ✓ Created {len(visits)} ICU visits")
-        
-        return visits  # Return for use in other generators
-    
+            n_admissions = 0
+
+            while True:
+                if profile['length_of_stay'] == 'pareto':
+                    # Heavy-tailed length of stay: mostly short, occasionally months
+                    los_days = int(LOS_PARETO_SCALE * random.paretovariate(LOS_PARETO_ALPHA)) + 1
+                else:
+                    # ICU length of stay: 1-21 days (skewed toward shorter stays)
+                    los_days = int(random.expovariate(1/5)) + 1  # Mean ~5 days
+                los_days = min(los_days, profile['max_los_days'])  # Cap at 21 days by default
+
+                discharge_date = admission_date + datetime.timedelta(days=los_days)
+                died = random.random() <= 0.1
+
+                visits.append((
+                    visit_id,  # visit_occurrence_id
+                    person_id,  # person_id
+                    icu_concept,  # visit_concept_id
+                    admission_date.date(),  # visit_start_date
+                    admission_date,  # visit_start_datetime
+                    discharge_date.date(),  # visit_end_date
+                    discharge_date,  # visit_end_datetime
+                    32817,  # visit_type_concept_id (EHR)
+                    None,  # provider_id
+                    None,  # care_site_id
+                    f"ICU-{visit_id}",  # visit_source_value
+                    0,  # visit_source_concept_id
+                    0,  # admitted_from_concept_id
+                    None,  # admitted_from_source_value
+                    32767 if died else 32826,  # discharged_to_concept_id (Patient died vs. Patient discharged alive)
+                    None  # discharged_to_source_value
+                ))
+
+                # Ward transfer: the stay is split into an ICU and a ward segment
+                if (los_days >= 2 and profile['ward_transfer_rate']
+                        and random.random() < profile['ward_transfer_rate']):
+                    transfer_date = admission_date + datetime.timedelta(hours=random.randint(24, los_days * 24 - 12))
+                    for detail_concept, source_value, start, end, preceding_id in [
+                        (icu_detail_concept, 'ICU', admission_date, transfer_date, None),
+                        (ward_detail_concept, 'Ward', transfer_date, discharge_date, visit_detail_id),
+                    ]:
+                        visit_details.append((
+                            visit_detail_id,  # visit_detail_id
+                            person_id,  # person_id
+                            detail_concept,  # visit_detail_concept_id
+                            start.date(),  # visit_detail_start_date
+                            start,  # visit_detail_start_datetime
+                            end.date(),  # visit_detail_end_date
+                            end,  # visit_detail_end_datetime
+                            32817,  # visit_detail_type_concept_id (EHR)
+                            None,  # provider_id
+                            None,  # care_site_id
+                            source_value,  # visit_detail_source_value
+                            0,  # visit_detail_source_concept_id
+                            0,  # admitted_from_concept_id
+                            None,  # admitted_from_source_value
+                            None,  # discharged_to_source_value
+                            0,  # discharged_to_concept_id
+                            preceding_id,  # preceding_visit_detail_id
+                            None,  # parent_visit_detail_id
+                            visit_id,  # visit_occurrence_id
+                        ))
+                        visit_detail_id += 1
+
+                visit_id += 1
+                n_admissions += 1
+
+                # Readmission after a gap, unless the patient died
+                if (n_admissions >= profile['max_visits'] or died
+                        or random.random() >= profile['readmission_rate']):
+                    break
+                admission_date = discharge_date + datetime.timedelta(days=random.randint(3, 60))
+
+            if len(visits) + len(visit_details) >= BATCH_SIZE:
+                self._commit_batch('visits', state, person_id,
+                                   {'visit_occurrence': visits, 'visit_detail': visit_details},
+                                   {'visit_occurrence': visit_id, 'visit_detail': visit_detail_id})
+                committed_visits.extend(visits)
+                visits = []
+                visit_details = []
+
+        self._commit_batch('visits', state, n_patients,
+                           {'visit_occurrence': visits, 'visit_detail': visit_details},
+                           {'visit_occurrence': visit_id, 'visit_detail': visit_detail_id}, complete=True)
+        committed_visits.extend(visits)
+        print(f"   ✓ Created {len(committed_visits)} ICU visits")
+        if state['row_counts'].get('visit_detail'):
+            print(f"   ✓ Created {state['row_counts']['visit_detail']} visit details (ICU -> ward transfers)")
+
+        return committed_visits  # Return for use in other generators
+
     def generate_conditions(self, visits: List):
-        """Generate CONDITION_OCCURRENCE - ICU diagnoses."""
+        """Generate CONDITION_OCCURRENCE - ICU diagnoses, plus CONDITION_ERA.
+
+        Eras are derived per person in the same sweep, once all of the
+        person's visits have been generated.
+        """
         print("\n3. Generating ICU conditions (diagnoses)...")
-        
+        state = self._start_stage('conditions', {'condition_occurrence': 1, 'condition_era': 1})
+        if state is None:
+            return
+
         # Common ICU conditions (SNOMED codes)
         icu_conditions = [
             (self.search_concept('sepsis', 'Condition'), 'Sepsis', 0.4),
@@ -223,11 +668,16 @@ class ICUDataGenerator:
             (self.search_concept('pneumonia', 'Condition'), 'Pneumonia', 0.35),
             (self.search_concept('shock', 'Condition'), 'Shock', 0.25),
         ]
-        
+
+        self._restore_rng(state)
         conditions = []
-        condition_id = 1
-        
-        for visit in visits:
+        condition_eras = []
+        person_conditions = []
+        condition_id = state['next_ids']['condition_occurrence']
+        condition_era_id = state['next_ids']['condition_era']
+
+        for position in range(state['position'], len(visits)):
+            visit = visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[3]
@@ -237,18 +687,17 @@ class ICUDataGenerator:
             filtered_conditions = [c for c in icu_conditions if random.random() < c[2]]
 
             # Only sample if we have conditions available
-            if not filtered_conditions:
-                continue
+            selected_conditions = []
+            if filtered_conditions:
+                selected_conditions = random.sample(
+                    filtered_conditions,
+                    k=min(n_conditions, len(filtered_conditions))
+                )
 
-            selected_conditions = random.sample(
-                filtered_conditions,
-                k=min(n_conditions, len(filtered_conditions))
-            )
-            
             for concept_id, name, prob in selected_conditions:
                 if concept_id == 0:
                     continue
-                    
+
                 conditions.append((
                     condition_id,  # condition_occurrence_id
                     person_id,  # person_id
@@ -268,24 +717,46 @@ class ICUDataGenerator:
                     None,  # condition_status_source_value
                 ))
                 condition_id += 1
-        
-        insert_query = """
-            INSERT INTO cdm.condition_occurrence (
-                condition_occurrence_id, person_id, condition_concept_id, condition_start_date,
-                condition_start_datetime, condition_end_date, condition_end_datetime,
-                condition_type_concept_id, condition_status_concept_id, stop_reason,
-                provider_id, visit_occurrence_id, visit_detail_id, condition_source_value,
-                condition_source_concept_id, condition_status_source_value
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, conditions)
-        self.conn.commit()
-        print(f"   ✓ Created {len(conditions)} condition records")
-    
+
+                # No end date recorded: the era rules treat it as start + 1 day
+                person_conditions.append((concept_id, visit_start, visit_start + datetime.timedelta(days=1)))
+
+            if not _is_last_visit_of_person(visits, position):
+                continue
+
+            for concept_id, start, end, count, _ in derive_eras(person_conditions):
+                condition_eras.append((
+                    condition_era_id,  # condition_era_id
+                    person_id,  # person_id
+                    concept_id,  # condition_concept_id
+                    start,  # condition_era_start_date
+                    end,  # condition_era_end_date
+                    count,  # condition_occurrence_count
+                ))
+                condition_era_id += 1
+            person_conditions = []
+
+            if len(conditions) + len(condition_eras) >= BATCH_SIZE:
+                self._commit_batch('conditions', state, position + 1,
+                                   {'condition_occurrence': conditions, 'condition_era': condition_eras},
+                                   {'condition_occurrence': condition_id, 'condition_era': condition_era_id})
+                conditions = []
+                condition_eras = []
+
+        self._commit_batch('conditions', state, len(visits),
+                           {'condition_occurrence': conditions, 'condition_era': condition_eras},
+                           {'condition_occurrence': condition_id, 'condition_era': condition_era_id},
+                           complete=True)
+        print(f"   ✓ Created {state['row_counts'].get('condition_occurrence', 0)} condition records")
+        print(f"   ✓ Created {state['row_counts'].get('condition_era', 0)} condition eras")
+
     def generate_vital_signs(self, visits: List):
         """Generate MEASUREMENT - Vital signs (hourly)."""
         print("\n4. Generating vital signs (hourly measurements)...")
-        
+        state = self._start_stage('vital_signs', {'measurement': 1})
+        if state is None:
+            return
+
         # Vital sign concepts (LOINC)
         vital_signs = [
             (self.search_concept('heart rate', 'Measurement'), 'Heart Rate', 60, 120, 8876),  # beats/min
@@ -295,30 +766,43 @@ class ICUDataGenerator:
             (self.search_concept('body temperature', 'Measurement'), 'Temperature', 36.0, 39.5, 8653),  # Celsius
             (self.search_concept('respiratory rate', 'Measurement'), 'Respiratory Rate', 12, 30, 8876),  # /min
         ]
-        
+        concept_skew = self.profile['concept_skew']
+        keep_probabilities = _concept_keep_probabilities(len(vital_signs), concept_skew)
+        high_frequency_fraction = self.profile['high_frequency_fraction']
+
+        self._restore_rng(state)
         measurements = []
-        measurement_id = 1
-        
-        for visit in visits:
+        measurement_id = state['next_ids']['measurement']
+
+        for position in range(state['position'], len(visits)):
+            visit = visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[4]  # datetime
             visit_end = visit[6]
-            
+
             # Calculate hours in ICU
             hours_in_icu = int((visit_end - visit_start).total_seconds() / 3600)
-            
-            # Generate hourly vital signs
-            for hour in range(0, hours_in_icu, 1):  # Hourly
-                measurement_time = visit_start + datetime.timedelta(hours=hour)
-                
-                for concept_id, name, min_val, max_val, unit_concept in vital_signs:
+
+            # High-frequency monitoring for a subset of visits
+            readings_per_hour = 1
+            if high_frequency_fraction and random.random() < high_frequency_fraction:
+                readings_per_hour = self.profile['high_frequency_per_hour']
+            reading_interval = datetime.timedelta(hours=1) / readings_per_hour
+
+            # Generate vital signs (hourly unless high-frequency)
+            for reading in range(0, hours_in_icu * readings_per_hour):
+                measurement_time = visit_start + reading * reading_interval
+
+                for (concept_id, name, min_val, max_val, unit_concept), keep_probability in zip(vital_signs, keep_probabilities):
                     if concept_id == 0:
                         continue
-                    
+                    if concept_skew and random.random() >= keep_probability:
+                        continue
+
                     # Add realistic variation
                     value = random.uniform(min_val, max_val)
-                    
+
                     measurements.append((
                         measurement_id,  # measurement_id
                         person_id,  # person_id
@@ -342,22 +826,26 @@ class ICUDataGenerator:
                         None,  # value_source_value
                     ))
                     measurement_id += 1
-                    
-                    # Commit in batches to avoid memory issues
-                    if len(measurements) >= 10000:
-                        self._insert_measurements_batch(measurements)
-                        measurements = []
-        
+
+            # Commit in batches to avoid memory issues
+            if len(measurements) >= BATCH_SIZE:
+                self._commit_batch('vital_signs', state, position + 1,
+                                   {'measurement': measurements}, {'measurement': measurement_id})
+                measurements = []
+
         # Insert remaining
-        if measurements:
-            self._insert_measurements_batch(measurements)
-        
+        self._commit_batch('vital_signs', state, len(visits), {'measurement': measurements},
+                           {'measurement': measurement_id}, complete=True)
+
         print(f"   ✓ Created ~{measurement_id-1} vital sign measurements")
-    
+
     def generate_laboratory_results(self, visits: List):
         """Generate MEASUREMENT - Laboratory results (daily)."""
         print("\n5. Generating laboratory results (daily)...")
-        
+        state = self._start_stage('laboratory_results', {'measurement': self._get_max_measurement_id() + 1})
+        if state is None:
+            return
+
         # Lab test concepts (LOINC)
         lab_tests = [
             (self.search_concept('lactate', 'Measurement'), 'Lactate', 0.5, 8.0, 8753),  # mmol/L
@@ -371,28 +859,34 @@ class ICUDataGenerator:
             (self.search_concept('pco2', 'Measurement'), 'PaCO2', 30, 60, 8876),  # mmHg
             (self.search_concept('po2', 'Measurement'), 'PaO2', 60, 120, 8876),  # mmHg
         ]
-        
+        concept_skew = self.profile['concept_skew']
+        keep_probabilities = _concept_keep_probabilities(len(lab_tests), concept_skew)
+
+        self._restore_rng(state)
         measurements = []
-        measurement_id = self._get_max_measurement_id() + 1
-        
-        for visit in visits:
+        measurement_id = state['next_ids']['measurement']
+
+        for position in range(state['position'], len(visits)):
+            visit = visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[4]
             visit_end = visit[6]
-            
+
             days_in_icu = (visit_end - visit_start).days + 1
-            
+
             # Generate daily labs
             for day in range(0, days_in_icu):
                 measurement_time = visit_start + datetime.timedelta(days=day, hours=6)  # Morning labs
-                
-                for concept_id, name, min_val, max_val, unit_concept in lab_tests:
+
+                for (concept_id, name, min_val, max_val, unit_concept), keep_probability in zip(lab_tests, keep_probabilities):
                     if concept_id == 0:
                         continue
-                    
+                    if concept_skew and random.random() >= keep_probability:
+                        continue
+
                     value = random.uniform(min_val, max_val)
-                    
+
                     measurements.append((
                         measurement_id,
                         person_id,
@@ -416,20 +910,24 @@ class ICUDataGenerator:
                         None,
                     ))
                     measurement_id += 1
-                    
-                    if len(measurements) >= 5000:
-                        self._insert_measurements_batch(measurements)
-                        measurements = []
-        
-        if measurements:
-            self._insert_measurements_batch(measurements)
-        
+
+            if len(measurements) >= BATCH_SIZE:
+                self._commit_batch('laboratory_results', state, position + 1,
+                                   {'measurement': measurements}, {'measurement': measurement_id})
+                measurements = []
+
+        self._commit_batch('laboratory_results', state, len(visits), {'measurement': measurements},
+                           {'measurement': measurement_id}, complete=True)
+
         print(f"   ✓ Created laboratory results")
-    
+
     def generate_ventilation_parameters(self, visits: List):
         """Generate MEASUREMENT - Mechanical ventilation parameters (hourly for ventilated patients)."""
         print("\n6. Generating ventilation parameters...")
-        
+        state = self._start_stage('ventilation_parameters', {'measurement': self._get_max_measurement_id() + 1})
+        if state is None:
+            return
+
         # Ventilation concepts (LOINC + SNOMED)
         vent_params = [
             (self.search_concept('FiO2', 'Measurement'), 'FiO2', 21, 100, 8554),  # %
@@ -438,31 +936,37 @@ class ICUDataGenerator:
             (self.search_concept('peak pressure', 'Measurement'), 'Peak Pressure', 15, 35, 8876),  # cmH2O
             (self.search_concept('plateau pressure', 'Measurement'), 'Plateau Pressure', 15, 30, 8876),  # cmH2O
         ]
-        
-        measurements = []
-        measurement_id = self._get_max_measurement_id() + 1
-        
+        concept_skew = self.profile['concept_skew']
+        keep_probabilities = _concept_keep_probabilities(len(vent_params), concept_skew)
+
         # 60% of patients are mechanically ventilated
         ventilated_visits = random.sample(visits, k=int(len(visits) * 0.6))
-        
-        for visit in ventilated_visits:
+
+        self._restore_rng(state)
+        measurements = []
+        measurement_id = state['next_ids']['measurement']
+
+        for position in range(state['position'], len(ventilated_visits)):
+            visit = ventilated_visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[4]
             visit_end = visit[6]
-            
+
             hours_ventilated = int((visit_end - visit_start).total_seconds() / 3600)
-            
+
             # Generate hourly ventilation parameters
             for hour in range(0, hours_ventilated, 1):
                 measurement_time = visit_start + datetime.timedelta(hours=hour)
-                
-                for concept_id, name, min_val, max_val, unit_concept in vent_params:
+
+                for (concept_id, name, min_val, max_val, unit_concept), keep_probability in zip(vent_params, keep_probabilities):
                     if concept_id == 0:
                         continue
-                    
+                    if concept_skew and random.random() >= keep_probability:
+                        continue
+
                     value = random.uniform(min_val, max_val)
-                    
+
                     measurements.append((
                         measurement_id,
                         person_id,
@@ -486,20 +990,28 @@ class ICUDataGenerator:
                         None,
                     ))
                     measurement_id += 1
-                    
-                    if len(measurements) >= 10000:
-                        self._insert_measurements_batch(measurements)
-                        measurements = []
-        
-        if measurements:
-            self._insert_measurements_batch(measurements)
-        
+
+            if len(measurements) >= BATCH_SIZE:
+                self._commit_batch('ventilation_parameters', state, position + 1,
+                                   {'measurement': measurements}, {'measurement': measurement_id})
+                measurements = []
+
+        self._commit_batch('ventilation_parameters', state, len(ventilated_visits),
+                           {'measurement': measurements}, {'measurement': measurement_id}, complete=True)
+
         print(f"   ✓ Created ventilation parameters for {len(ventilated_visits)} ventilated patients")
-    
+
     def generate_medications(self, visits: List):
-        """Generate DRUG_EXPOSURE - ICU medications."""
+        """Generate DRUG_EXPOSURE - ICU medications, plus ingredient-level DRUG_ERA.
+
+        Eras are derived per person in the same sweep, once all of the
+        person's visits have been generated.
+        """
         print("\n7. Generating ICU medications...")
-        
+        state = self._start_stage('medications', {'drug_exposure': 1, 'drug_era': 1})
+        if state is None:
+            return
+
         # Common ICU drugs (RxNorm concepts)
         icu_drugs = [
             (self.search_concept('propofol', 'Drug'), 'Propofol', 0.7),  # Sedative
@@ -509,26 +1021,32 @@ class ICUDataGenerator:
             (self.search_concept('vancomycin', 'Drug'), 'Vancomycin', 0.4),  # Antibiotic
             (self.search_concept('piperacillin', 'Drug'), 'Piperacillin-Tazobactam', 0.35),  # Antibiotic
         ]
-        
+        ingredients = self._get_ingredients([concept_id for concept_id, _, _ in icu_drugs if concept_id])
+
+        self._restore_rng(state)
         drug_exposures = []
-        drug_exposure_id = 1
-        
-        for visit in visits:
+        drug_eras = []
+        person_exposures = []
+        drug_exposure_id = state['next_ids']['drug_exposure']
+        drug_era_id = state['next_ids']['drug_era']
+
+        for position in range(state['position'], len(visits)):
+            visit = visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[4]
             visit_end = visit[6]
-            
+
             for concept_id, name, probability in icu_drugs:
                 if concept_id == 0 or random.random() > probability:
                     continue
-                
+
                 # Drug given for portion of ICU stay
                 drug_start = visit_start + datetime.timedelta(hours=random.randint(0, 12))
                 duration_hours = random.randint(24, int((visit_end - visit_start).total_seconds() / 3600))
                 drug_end = drug_start + datetime.timedelta(hours=duration_hours)
                 drug_end = min(drug_end, visit_end)
-                
+
                 drug_exposures.append((
                     drug_exposure_id,  # drug_exposure_id
                     person_id,  # person_id
@@ -555,25 +1073,47 @@ class ICUDataGenerator:
                     None,  # dose_unit_source_value
                 ))
                 drug_exposure_id += 1
-        
-        insert_query = """
-            INSERT INTO cdm.drug_exposure (
-                drug_exposure_id, person_id, drug_concept_id, drug_exposure_start_date,
-                drug_exposure_start_datetime, drug_exposure_end_date, drug_exposure_end_datetime,
-                verbatim_end_date, drug_type_concept_id, stop_reason, refills, quantity,
-                days_supply, sig, route_concept_id, lot_number, provider_id,
-                visit_occurrence_id, visit_detail_id, drug_source_value, drug_source_concept_id,
-                route_source_value, dose_unit_source_value
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, drug_exposures)
-        self.conn.commit()
-        print(f"   ✓ Created {len(drug_exposures)} drug exposure records")
-    
+
+                for ingredient_id in ingredients[concept_id]:
+                    person_exposures.append((ingredient_id, drug_start.date(), drug_end.date()))
+
+            if not _is_last_visit_of_person(visits, position):
+                continue
+
+            for concept_id, start, end, count, gap_days in derive_eras(person_exposures):
+                drug_eras.append((
+                    drug_era_id,  # drug_era_id
+                    person_id,  # person_id
+                    concept_id,  # drug_concept_id (ingredient)
+                    start,  # drug_era_start_date
+                    end,  # drug_era_end_date
+                    count,  # drug_exposure_count
+                    gap_days,  # gap_days
+                ))
+                drug_era_id += 1
+            person_exposures = []
+
+            if len(drug_exposures) + len(drug_eras) >= BATCH_SIZE:
+                self._commit_batch('medications', state, position + 1,
+                                   {'drug_exposure': drug_exposures, 'drug_era': drug_eras},
+                                   {'drug_exposure': drug_exposure_id, 'drug_era': drug_era_id})
+                drug_exposures = []
+                drug_eras = []
+
+        self._commit_batch('medications', state, len(visits),
+                           {'drug_exposure': drug_exposures, 'drug_era': drug_eras},
+                           {'drug_exposure': drug_exposure_id, 'drug_era': drug_era_id},
+                           complete=True)
+        print(f"   ✓ Created {state['row_counts'].get('drug_exposure', 0)} drug exposure records")
+        print(f"   ✓ Created {state['row_counts'].get('drug_era', 0)} drug eras")
+
     def generate_procedures(self, visits: List):
         """Generate PROCEDURE_OCCURRENCE - ICU procedures."""
         print("\n8. Generating ICU procedures...")
-        
+        state = self._start_stage('procedures', {'procedure_occurrence': 1})
+        if state is None:
+            return
+
         # ICU procedures (SNOMED)
         icu_procedures = [
             (self.search_concept('intubation', 'Procedure'), 'Endotracheal Intubation', 0.6),
@@ -581,21 +1121,23 @@ class ICUDataGenerator:
             (self.search_concept('central venous catheter', 'Procedure'), 'Central Line Placement', 0.5),
             (self.search_concept('arterial catheter', 'Procedure'), 'Arterial Line Placement', 0.4),
         ]
-        
+
+        self._restore_rng(state)
         procedures = []
-        procedure_id = 1
-        
-        for visit in visits:
+        procedure_id = state['next_ids']['procedure_occurrence']
+
+        for position in range(state['position'], len(visits)):
+            visit = visits[position]
             visit_id = visit[0]
             person_id = visit[1]
             visit_start = visit[3]
-            
+
             for concept_id, name, probability in icu_procedures:
                 if concept_id == 0 or random.random() > probability:
                     continue
-                
+
                 procedure_date = visit_start + datetime.timedelta(hours=random.randint(0, 24))
-                
+
                 procedures.append((
                     procedure_id,  # procedure_occurrence_id
                     person_id,  # person_id
@@ -613,25 +1155,28 @@ class ICUDataGenerator:
                     None,  # modifier_source_value
                 ))
                 procedure_id += 1
-        
-        insert_query = """
-            INSERT INTO cdm.procedure_occurrence (
-                procedure_occurrence_id, person_id, procedure_concept_id, procedure_date,
-                procedure_datetime, procedure_type_concept_id, modifier_concept_id, quantity,
-                provider_id, visit_occurrence_id, visit_detail_id, procedure_source_value,
-                procedure_source_concept_id, modifier_source_value
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, procedures)
-        self.conn.commit()
-        print(f"   ✓ Created {len(procedures)} procedure records")
-    
+
+            if len(procedures) >= BATCH_SIZE:
+                self._commit_batch('procedures', state, position + 1,
+                                   {'procedure_occurrence': procedures},
+                                   {'procedure_occurrence': procedure_id})
+                procedures = []
+
+        self._commit_batch('procedures', state, len(visits), {'procedure_occurrence': procedures},
+                           {'procedure_occurrence': procedure_id}, complete=True)
+        print(f"   ✓ Created {state['row_counts'].get('procedure_occurrence', 0)} procedure records")
+
     def generate_observation_periods(self, visits: List):
         """Generate OBSERVATION_PERIOD - required by OMOP CDM and Achilles."""
         print("\n9. Generating observation periods...")
+        state = self._start_stage('observation_periods', {'observation_period': 1})
+        if state is None:
+            return
 
+        self._restore_rng(state)
         obs_periods = []
-        for i, visit in enumerate(visits):
+        for i in range(state['position'], len(visits)):
+            visit = visits[i]
             person_id = visit[1]
             obs_start = visit[3]   # visit_start_date (date)
             obs_end = visit[5]     # visit_end_date (date)
@@ -644,134 +1189,531 @@ class ICUDataGenerator:
                 32817,      # period_type_concept_id (EHR)
             ))
 
-        insert_query = """
-            INSERT INTO cdm.observation_period (
-                observation_period_id, person_id, observation_period_start_date,
-                observation_period_end_date, period_type_concept_id
-            ) VALUES (%s, %s, %s, %s, %s)
-        """
-        self.cursor.executemany(insert_query, obs_periods)
-        self.conn.commit()
-        print(f"   ✓ Created {len(obs_periods)} observation periods")
-
-    def _insert_measurements_batch(self, measurements):
-        """Helper to insert measurement batches."""
-        insert_query = """
-            INSERT INTO cdm.measurement (
-                measurement_id, person_id, measurement_concept_id, measurement_date,
-                measurement_datetime, measurement_time, measurement_type_concept_id,
-                operator_concept_id, value_as_number, value_as_concept_id, unit_concept_id,
-                range_low, range_high, provider_id, visit_occurrence_id, visit_detail_id,
-                measurement_source_value, measurement_source_concept_id, unit_source_value,
-                value_source_value
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            if len(obs_periods) >= BATCH_SIZE:
+                self._commit_batch('observation_periods', state, i + 1,
+                                   {'observation_period': obs_periods}, {'observation_period': i + 2})
+                obs_periods = []
+
+        self._commit_batch('observation_periods', state, len(visits), {'observation_period': obs_periods},
+                           {'observation_period': len(visits) + 1}, complete=True)
+        print(f"   ✓ Created {len(visits)} observation periods")
+
+    def _insert_rows(self, table: str, rows: List):
+        """Bulk insert rows into a CDM table (columns as in CDM_COLUMNS)."""
+        columns = CDM_COLUMNS[table]
+        execute_values(
+            self.cursor,
+            f"INSERT INTO cdm.{table} ({', '.join(columns)}) VALUES %s",
+            rows,
+            page_size=1000
+        )
+
+    def _get_ingredients(self, drug_concept_ids: List[int]) -> Dict[int, List[int]]:
+        """Map drug concepts to their RxNorm ingredients via CONCEPT_ANCESTOR.
+
+        Combination drugs map to each of their ingredients. Drugs without an
+        ingredient ancestor (e.g. when concepts come from a concept index and
+        concept_ancestor is not loaded) map to themselves.
         """
-        self.cursor.executemany(insert_query, measurements)
-        self.conn.commit()
-    
+        ingredients = {}
+        if drug_concept_ids:
+            self.cursor.execute("""
+                SELECT ca.descendant_concept_id, ca.ancestor_concept_id
+                FROM vocab.concept_ancestor ca
+                JOIN vocab.concept c ON c.concept_id = ca.ancestor_concept_id
+                WHERE ca.descendant_concept_id = ANY(%s)
+                AND c.vocabulary_id IN ('RxNorm', 'RxNorm Extension')
+                AND c.concept_class_id = 'Ingredient'
+                AND c.invalid_reason IS NULL
+                ORDER BY ca.descendant_concept_id, ca.ancestor_concept_id
+            """, (drug_concept_ids,))
+            for drug_concept_id, ingredient_id in self.cursor.fetchall():
+                ingredients.setdefault(drug_concept_id, []).append(ingredient_id)
+
+        missing = [concept_id for concept_id in drug_concept_ids if concept_id not in ingredients]
+        if missing:
+            print(f"   ⚠️  {len(missing)} drug(s) without an ingredient ancestor, eras use the drug concept")
+        for concept_id in missing:
+            ingredients[concept_id] = [concept_id]
+        return ingredients
+
+    def _load_visits(self) -> List:
+        """Read committed visits back in generation order."""
+        self.cursor.execute(f"""
+            SELECT {', '.join(CDM_COLUMNS['visit_occurrence'])}
+            FROM cdm.visit_occurrence
+            ORDER BY visit_occurrence_id
+        """)
+        return self.cursor.fetchall()
+
     def _get_max_measurement_id(self) -> int:
         """Get current max measurement_id."""
         self.cursor.execute("SELECT COALESCE(MAX(measurement_id), 0) FROM cdm.measurement")
         return self.cursor.fetchone()[0]
-    
-    def verify_data(self):
-        """Generate verification report."""
-        print("\n" + "="*60)
-        print("DATA GENERATION VERIFICATION REPORT")
-        print("="*60)
-        
-        tables = [
-            ('person', 'patient demographics'),
-            ('visit_occurrence', 'ICU admissions'),
-            ('condition_occurrence', 'diagnoses'),
-            ('measurement', 'vital signs + labs + ventilation'),
-            ('drug_exposure', 'medications'),
-            ('procedure_occurrence', 'procedures'),
-        ]
-        
-        for table, description in tables:
-            self.cursor.execute(f"SELECT COUNT(*) FROM cdm.{table}")
-            count = self.cursor.fetchone()[0]
-            print(f"{table:25s} {count:>10,} rows  ({description})")
-        
-        print("\n" + "="*60)
-        print("MEASUREMENT BREAKDOWN")
-        print("="*60)
-        
-        self.cursor.execute("""
-            SELECT 
-                c.concept_name,
-                c.domain_id,
-                COUNT(*) as measurement_count
-            FROM cdm.measurement m
-            JOIN vocab.concept c ON m.measurement_concept_id = c.concept_id
-            GROUP BY c.concept_name, c.domain_id
-            ORDER BY measurement_count DESC
-            LIMIT 15
-        """)
-        
-        for name, domain, count in self.cursor.fetchall():
-            print(f"{name:40s} {count:>10,}")
-        
-        print("\n" + "="*60)
-        print("SAMPLE PATIENT DATA")
-        print("="*60)
-        
-        self.cursor.execute("""
+
+    def _record_rows(self, table: str, n_rows: int):
+        """Track rows written per table for the verification report."""
+        self.row_counts[table] = self.row_counts.get(table, 0) + n_rows
+
+    def snapshot_key(self, run_config: Dict) -> str:
+        """Key identifying the dataset a run would generate.
+
+        Hashes the generator version, run configuration (including the
+        seed), where concepts come from and the vocabulary version.
+        """
+        self.cursor.execute("SELECT vocabulary_version FROM vocab.vocabulary WHERE vocabulary_id = 'None'")
+        result = self.cursor.fetchone()
+        vocabulary_version = result[0] if result else None
+
+        concept_source = 'vocab schema'
+        if self.concept_index is not None:
+            concept_source = f"index {self.concept_index.fingerprint()}"
+
+        key_data = {
+            'generator_version': GENERATOR_VERSION,
+            'config': run_config,
+            'concepts': concept_source,
+            'vocabulary_version': vocabulary_version,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def _copy_table(self, table: str, path: str, direction: str):
+        """COPY one CDM table to or from a gzip-compressed binary file.
+
+        Runs on its own connection so tables can be copied in parallel.
+        """
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            with conn.cursor() as cursor:
+                if direction == 'save':
+                    # Fast compression: level 9 is several times slower for
+                    # little gain on binary COPY data
+                    with gzip.open(path, 'wb', compresslevel=1) as f:
+                        cursor.copy_expert(f"COPY cdm.{table} TO STDOUT WITH (FORMAT binary)", f)
+                else:
+                    with gzip.open(path, 'rb') as f:
+                        cursor.copy_expert(f"COPY cdm.{table} FROM STDIN WITH (FORMAT binary)", f)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_snapshot(self, snapshot_dir: str, key: str, run_config: Dict, workers: int = 4):
+        """Save the generated CDM tables as a snapshot under snapshot_dir/key."""
+        print(f"\n💾 Saving dataset snapshot {key}...")
+        target = os.path.join(snapshot_dir, key)
+        tmp_target = target + '.tmp'
+        shutil.rmtree(tmp_target, ignore_errors=True)
+        os.makedirs(tmp_target)
+
+        tables = list(CDM_COLUMNS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._copy_table, table, os.path.join(tmp_target, f"{table}.copy.gz"), 'save')
+                for table in tables
+            ]
+            for future in futures:
+                future.result()
+
+        # The completed run's checkpoint, so a restored dataset still
+        # reports its recorded counts (--verify-only) and --resume is a no-op
+        self.cursor.execute("SELECT stage, status, state FROM results.generation_checkpoint ORDER BY stage")
+        checkpoint = [list(row) for row in self.cursor.fetchall()]
+
+        manifest = {
+            'key': key,
+            'generator_version': GENERATOR_VERSION,
+            'config': run_config,
+            'tables': tables,
+            'row_counts': self.row_counts,
+            'checkpoint': checkpoint,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(tmp_target, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Publish the snapshot only once it is complete
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(tmp_target, target)
+        print(f"   ✓ Saved {len(tables)} tables to {target}")
+
+    def restore_snapshot(self, snapshot_dir: str, key: str, workers: int = 4) -> bool:
+        """Restore the CDM tables from a matching snapshot, if one exists.
+
+        Tables are loaded in parallel, one connection each. Returns False
+        when there is no snapshot for this key.
+        """
+        target = os.path.join(snapshot_dir, key)
+        manifest_path = os.path.join(target, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return False
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        print(f"\n⚡ Restoring dataset snapshot {key}...")
+        self.clear_existing_data()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (table, executor.submit(self._copy_table, table,
+                                        os.path.join(target, f"{table}.copy.gz"), 'restore'))
+                for table in manifest['tables']
+            ]
+            for table, future in futures:
+                future.result()
+                print(f"   ✓ Restored cdm.{table}")
+
+        if 'checkpoint' in manifest:
+            self._create_checkpoint_table(manifest['checkpoint'])
+        self.row_counts = dict(manifest['row_counts'])
+        return True
+
+    def _count_exact(self, cursor, table: str) -> Tuple[int, int]:
+        """Exact row count (full scan)."""
+        cursor.execute(f"SELECT COUNT(*) FROM cdm.{table}")
+        return cursor.fetchone()[0], 0
+
+    def _table_statistics(self, cursor, table: str) -> Tuple:
+        """(reltuples, relpages, n_mod_since_analyze, default_statistics_target)."""
+        cursor.execute("""
+            SELECT c.reltuples::bigint, c.relpages, s.n_mod_since_analyze,
+                   current_setting('default_statistics_target')::int
+            FROM pg_class c
+            JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE c.oid = %s::regclass
+        """, (f"cdm.{table}",))
+        return cursor.fetchone()
+
+    def _count_estimate(self, cursor, table: str) -> Tuple[int, int]:
+        """Row count from planner statistics.
+
+        The bound covers the rows modified since the last ANALYZE plus, on
+        tables larger than ANALYZE's page sample, a 95% bound on the
+        extrapolation from that sample (same form as sample mode).
+
+        TRUNCATE resets the statistics, so right after generation the tables
+        are usually not analyzed yet; they are analyzed here first. Returns
+        (None, 0) if there are still no statistics.
+        """
+        reltuples, relpages, n_mod_since_analyze, statistics_target = self._table_statistics(cursor, table)
+
+        if reltuples < 0:
+            # ANALYZE only reads a bounded page sample, so this stays cheap
+            cursor.execute(f"ANALYZE cdm.{table}")
+            cursor.connection.commit()
+            reltuples, relpages, n_mod_since_analyze, statistics_target = self._table_statistics(cursor, table)
+            if reltuples < 0:
+                return None, 0
+
+        bound = n_mod_since_analyze
+        sampled_pages = ANALYZE_PAGES_PER_TARGET * statistics_target
+        if relpages > sampled_pages:
+            p = sampled_pages / relpages
+            bound += int(math.ceil(1.96 * reltuples * math.sqrt((1 - p) / sampled_pages)))
+        return reltuples, bound
+
+    def _count_sample(self, cursor, table: str, sample_percent: float) -> Tuple[int, int]:
+        """Row count from a TABLESAMPLE SYSTEM block sample with a 95% bound.
+
+        SYSTEM samples whole pages with probability p, so with rows spread
+        evenly over N pages the scaled count has a standard error of
+        count * sqrt((1 - p) / (p * N)).
+        """
+        cursor.execute(
+            "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int",
+            (f"cdm.{table}",)
+        )
+        n_pages = cursor.fetchone()[0]
+        p = sample_percent / 100.0
+
+        if n_pages * p < MIN_SAMPLED_PAGES:
+            # Too few pages for a meaningful sample - an exact count is cheap here
+            return self._count_exact(cursor, table)
+
+        cursor.execute(
+            f"SELECT COUNT(*) FROM cdm.{table} TABLESAMPLE SYSTEM (%s) REPEATABLE (42)",
+            (sample_percent,)
+        )
+        count = int(round(cursor.fetchone()[0] / p))
+        std_error = count * math.sqrt((1 - p) / (p * n_pages))
+        return count, int(math.ceil(1.96 * std_error))
+
+    def _measurement_breakdown(self, cursor, mode: str, sample_percent: float) -> List:
+        """Top 15 measurement concepts as (concept_name, count) rows."""
+        if mode == 'estimate':
+            # Most common values and their frequencies from pg_stats
+            stats_query = """
+                SELECT s.most_common_vals::text::int[], s.most_common_freqs, c.reltuples
+                FROM pg_stats s
+                JOIN pg_class c ON c.oid = 'cdm.measurement'::regclass
+                WHERE s.schemaname = 'cdm'
+                AND s.tablename = 'measurement'
+                AND s.attname = 'measurement_concept_id'
+            """
+            cursor.execute(stats_query)
+            result = cursor.fetchone()
+            if not result:
+                # Not analyzed since generation (see _count_estimate)
+                cursor.execute("ANALYZE cdm.measurement")
+                cursor.connection.commit()
+                cursor.execute(stats_query)
+                result = cursor.fetchone()
+            if not result or not result[0]:
+                return []
+            values, freqs, reltuples = result
+            counts = {v: int(f * reltuples) for v, f in zip(values, freqs)}
+        else:
+            tablesample = ""
+            scale = 1.0
+            if mode == 'sample':
+                tablesample = f"TABLESAMPLE SYSTEM ({float(sample_percent)}) REPEATABLE (42)"
+                scale = 100.0 / sample_percent
+
+            # Aggregate before joining so the join only sees one row per concept
+            cursor.execute(f"""
+                SELECT measurement_concept_id, COUNT(*)
+                FROM cdm.measurement {tablesample}
+                GROUP BY measurement_concept_id
+                ORDER BY COUNT(*) DESC
+                LIMIT 15
+            """)
+            counts = {cid: int(round(n * scale)) for cid, n in cursor.fetchall()}
+
+        if not counts:
+            return []
+
+        # Without a loaded vocabulary (--concept-index), fall back to the
+        # source value recorded with the measurements
+        cursor.execute("""
+            SELECT ids.concept_id, COALESCE(c.concept_name, (
+                SELECT m.measurement_source_value
+                FROM cdm.measurement m
+                WHERE m.measurement_concept_id = ids.concept_id
+                LIMIT 1
+            ))
+            FROM unnest(%s::int[]) AS ids(concept_id)
+            LEFT JOIN vocab.concept c ON c.concept_id = ids.concept_id
+        """, (list(counts),))
+        names = {cid: name for cid, name in cursor.fetchall() if name is not None}
+        breakdown = [(names.get(cid, f"concept {cid}"), n) for cid, n in counts.items()]
+        breakdown.sort(key=lambda row: row[1], reverse=True)
+        return breakdown[:15]
+
+    def _sample_patients(self, cursor) -> List:
+        """First five patients with their ICU stay."""
+        cursor.execute("""
             SELECT 
                 p.person_id,
                 EXTRACT(YEAR FROM CURRENT_DATE) - p.year_of_birth as age,
-                g.concept_name as gender,
+                COALESCE(g.concept_name, p.gender_source_value) as gender,
                 v.visit_start_date,
                 v.visit_end_date,
                 v.visit_end_date - v.visit_start_date as los_days
             FROM cdm.person p
             JOIN cdm.visit_occurrence v ON p.person_id = v.person_id
-            JOIN vocab.concept g ON p.gender_concept_id = g.concept_id
+            LEFT JOIN vocab.concept g ON p.gender_concept_id = g.concept_id
             LIMIT 5
         """)
-        
-        for person_id, age, gender, start, end, los in self.cursor.fetchall():
-            print(f"Patient {person_id}: {age}y {gender}, ICU {start} to {end} ({los} days)")
-        
-        print("\n" + "="*60)
+        return cursor.fetchall()
+
+    def verify_data(self, mode: str = 'exact', workers: int = 4, sample_percent: float = 1.0):
+        """Generate verification report.
+
+        Checks run concurrently, each on its own pooled connection. Counts
+        are compared against the rows this generator recorded writing.
+        """
+        if mode not in VERIFY_MODES:
+            raise ValueError(f"Unknown verification mode: {mode}")
+
+        count_functions = {
+            'exact': self._count_exact,
+            'estimate': self._count_estimate,
+            'sample': lambda cursor, table: self._count_sample(cursor, table, sample_percent),
+        }
+        pool = psycopg2.pool.ThreadedConnectionPool(1, workers, **self.db_config)
+
+        def run_check(check, *args):
+            conn = pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    return check(cursor, *args)
+            finally:
+                conn.rollback()
+                pool.putconn(conn)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                count_futures = [
+                    (table, description, executor.submit(run_check, count_functions[mode], table))
+                    for table, description in VERIFY_TABLES
+                ]
+                breakdown_future = executor.submit(
+                    run_check, self._measurement_breakdown, mode, sample_percent
+                )
+                patients_future = executor.submit(run_check, self._sample_patients)
+
+                print("\n" + "="*60)
+                print(f"DATA GENERATION VERIFICATION REPORT ({mode})")
+                print("="*60)
+
+                mismatches = 0
+                for table, description, future in count_futures:
+                    count, bound = future.result()
+                    if count is None:
+                        print(f"{table:25s} {'no statistics (run ANALYZE)':>17s}  ({description})")
+                        continue
+
+                    line = f"{table:25s} {count:>12,} rows"
+                    if bound:
+                        line += f" ±{bound:,}"
+
+                    expected = self.row_counts.get(table)
+                    if expected is not None:
+                        within_bound = abs(count - expected) <= bound
+                        mismatches += not within_bound
+                        line += f"  (expected {expected:,} {'✓' if within_bound else '✗'})"
+                    print(f"{line}  ({description})")
+
+                if self.row_counts:
+                    if mismatches:
+                        print(f"\n⚠️  {mismatches} table(s) outside the expected row count")
+                    else:
+                        print("\n✓ All counts match the rows recorded during generation")
+
+                print("\n" + "="*60)
+                print("MEASUREMENT BREAKDOWN")
+                print("="*60)
+
+                breakdown = breakdown_future.result()
+                if not breakdown:
+                    print("No measurement statistics available (run ANALYZE cdm.measurement)")
+                for name, count in breakdown:
+                    print(f"{name:40s} {count:>10,}")
+
+                print("\n" + "="*60)
+                print("SAMPLE PATIENT DATA")
+                print("="*60)
+
+                for person_id, age, gender, start, end, los in patients_future.result():
+                    print(f"Patient {person_id}: {age}y {gender}, ICU {start} to {end} ({los} days)")
+
+                print("\n" + "="*60)
+        finally:
+            pool.closeall()
     
     def close(self):
         """Close database connection."""
         self.cursor.close()
         self.conn.close()
+        if self.concept_index is not None:
+            self.concept_index.close()
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Generate synthetic ICU data in the OMOP CDM")
+    parser.add_argument('--patients', type=int, default=100,
+                        help="number of patients to generate (default: 100)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f"random seed (default: {DEFAULT_SEED})")
+    parser.add_argument('--profile', choices=list(WORKLOAD_PROFILES), default='default',
+                        help="workload profile: readmissions, long stays, high-frequency "
+                             "monitoring, concept skew, or all of them (stress)")
+    parser.add_argument('--concept-skew', type=float,
+                        help="override the profile's measurement concept skew (Zipf exponent, 0 = uniform)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run from its last checkpoint "
+                             "instead of clearing existing data")
+    parser.add_argument('--snapshot-dir', default=DEFAULT_SNAPSHOT_DIR,
+                        help="directory of dataset snapshots (default: ../snapshots)")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="always generate, without restoring or saving a snapshot")
+    parser.add_argument('--snapshot-workers', type=int, default=4,
+                        help="tables saved/restored in parallel (default: 4)")
+    parser.add_argument('--verify-mode', choices=VERIFY_MODES, default='exact',
+                        help="row count method for the verification report (default: exact)")
+    parser.add_argument('--verify-workers', type=int, default=4,
+                        help="concurrent connections used by the verification report")
+    parser.add_argument('--sample-percent', type=float, default=1.0,
+                        help="percentage of table pages read in sample mode (default: 1.0)")
+    parser.add_argument('--verify-only', action='store_true',
+                        help="skip generation and only report on the existing data")
+    parser.add_argument('--concept-index', metavar='PATH',
+                        help="resolve concepts from an index built by concept_index.py "
+                             "instead of the vocab schema")
+    args = parser.parse_args()
+    if args.verify_workers < 1:
+        parser.error("--verify-workers must be at least 1")
+    if args.snapshot_workers < 1:
+        parser.error("--snapshot-workers must be at least 1")
+    if not 0 < args.sample_percent <= 100:
+        parser.error("--sample-percent must be greater than 0 and at most 100")
+    return args
 
 
 def main():
     """Main execution function."""
+    args = parse_args()
+    random.seed(args.seed)
+
     print("="*60)
     print("INDICATE SPE: ICU Dummy Data Generator")
     print("="*60)
     print("Configuration:")
-    print("  • Patients: 100")
+    print(f"  • Patients: {args.patients}")
+    print(f"  • Seed: {args.seed}")
+    print(f"  • Workload profile: {args.profile}")
     print("  • Domains: Ventilation, Laboratory, Vital Signs, Medications")
     print("  • OMOP CDM: v5.4")
+    print(f"  • Verification: {args.verify_mode}")
+    print(f"  • Concepts: {args.concept_index or 'vocab schema'}")
     print("="*60)
     
     try:
-        generator = ICUDataGenerator(DB_CONFIG)
-
-        # Clear existing data before generating new data
-        generator.clear_existing_data()
-
-        # Generate data
-        generator.generate_persons(n_patients=100)
-        visits = generator.generate_icu_visits(n_patients=100)
-        generator.generate_observation_periods(visits)
-        generator.generate_conditions(visits)
-        generator.generate_vital_signs(visits)
-        generator.generate_laboratory_results(visits)
-        generator.generate_ventilation_parameters(visits)
-        generator.generate_medications(visits)
-        generator.generate_procedures(visits)
+        concept_index = ConceptIndex(args.concept_index) if args.concept_index else None
+        profile = dict(WORKLOAD_PROFILES[args.profile])
+        if args.concept_skew is not None:
+            profile['concept_skew'] = args.concept_skew
+        generator = ICUDataGenerator(DB_CONFIG, concept_index=concept_index, profile=profile)
+
+        if args.verify_only:
+            if not generator.load_recorded_counts():
+                print("\nNo generation checkpoint found, reporting counts without expectations")
+        else:
+            run_config = {'patients': args.patients, 'seed': args.seed, 'profile': profile}
+            use_snapshot = not args.no_snapshot
+            snapshot_key = generator.snapshot_key(run_config) if use_snapshot else None
+
+            # An identical dataset was generated before: restore it instead
+            restored = (use_snapshot and not args.resume
+                        and generator.restore_snapshot(args.snapshot_dir, snapshot_key,
+                                                       workers=args.snapshot_workers))
+
+            if not restored:
+                # Clear existing data before generating new data, unless resuming
+                generator.start_run(run_config, resume=args.resume)
+
+                # Generate data
+                generator.generate_persons(n_patients=args.patients)
+                visits = generator.generate_icu_visits(n_patients=args.patients)
+                generator.generate_observation_periods(visits)
+                generator.generate_conditions(visits)
+                generator.generate_vital_signs(visits)
+                generator.generate_laboratory_results(visits)
+                generator.generate_ventilation_parameters(visits)
+                generator.generate_medications(visits)
+                generator.generate_procedures(visits)
+
+                if use_snapshot:
+                    generator.save_snapshot(args.snapshot_dir, snapshot_key, run_config,
+                                            workers=args.snapshot_workers)
         
         # Verify
-        generator.verify_data()
+        generator.verify_data(
+            mode=args.verify_mode,
+            workers=args.verify_workers,
+            sample_percent=args.sample_percent
+        )
         
         generator.close()
         
@@ -0,0 +1,61 @@
+#!/bin/bash
+# Verification script for the concept index (scripts/concept_index.py)
+
+echo "========================================="
+echo "INDICATE SPE - Concept Index Verification"
+echo "========================================="
+echo ""
+
+# Color codes for output
+GREEN='\033[0;32m'
+RED='\033[0;31m'
+NC='\033[0m' # No Color
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+CONCEPT_INDEX="$SCRIPT_DIR/../scripts/concept_index.py"
+WORK_DIR=$(mktemp -d)
+trap 'rm -rf "$WORK_DIR"' EXIT
+FAILURES=0
+
+# Function to check a search result
+check_search() {
+    local description="$1" term="$2" expected="$3"
+    echo -n "$description... "
+    RESULT=$(python3 "$CONCEPT_INDEX" search "$WORK_DIR/CONCEPT.idx" "$term" --domain Measurement | cut -f1)
+    if [ "$RESULT" = "$expected" ]; then
+        echo -e "${GREEN}✓ PASS${NC}"
+    else
+        echo -e "${RED}✗ FAIL${NC} (got '$RESULT', expected '$expected')"
+        FAILURES=$((FAILURES + 1))
+    fi
+}
+
+# Minimal Athena CONCEPT.csv (tab-separated)
+printf '%s\n' \
+    "concept_id	concept_name	domain_id	vocabulary_id	concept_class_id	standard_concept	concept_code	valid_start_date	valid_end_date	invalid_reason" \
+    "3000905	White blood cells [#/volume] in Blood	Measurement	LOINC	Lab Test	S	6690-2	19700101	20991231	" \
+    "3002385	Cell count of Body fluid	Measurement	LOINC	Lab Test	S	6743-9	19700101	20991231	" \
+    "3027018	Heart rate	Measurement	LOINC	Clinical Observation	S	8867-4	19700101	20991231	" \
+    > "$WORK_DIR/CONCEPT.csv"
+
+echo -n "Test 1: Build index... "
+python3 "$CONCEPT_INDEX" build "$WORK_DIR/CONCEPT.csv" -o "$WORK_DIR/CONCEPT.idx" > /dev/null
+if [ $? -eq 0 ]; then
+    echo -e "${GREEN}✓ PASS${NC}"
+else
+    echo -e "${RED}✗ FAIL${NC}"
+    exit 1
+fi
+
+check_search "Test 2: Whole-word search" "heart rate" 3027018
+check_search "Test 3: Last word matches a word prefix" "white blood cell" 3000905
+check_search "Test 4: Exact word does not hide prefix matches" "cell" 3000905
+check_search "Test 5: Inner words must be whole words" "whit blood" "Concept not found"
+
+echo ""
+if [ $FAILURES -eq 0 ]; then
+    echo -e "${GREEN}All concept index checks passed${NC}"
+else
+    echo -e "${RED}$FAILURES concept index check(s) failed${NC}"
+    exit 1
+fi